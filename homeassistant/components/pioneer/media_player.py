@@ -1,6 +1,9 @@
 """Support for Pioneer Network Receivers."""
+import asyncio
+from functools import lru_cache, partial
 import logging
-import telnetlib
+import random
+import re
 import time
 
 import voluptuous as vol
@@ -26,6 +29,7 @@ from homeassistant.const import (
 )
 from homeassistant.exceptions import PlatformNotReady
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.storage import Store
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -51,8 +55,37 @@ SUPPORT_PIONEER = (
 
 MAX_VOLUME = 185
 MAX_SOURCE_NUMBERS = 60
+# Source slots queried in one discovery burst
+SOURCE_BATCH_SIZE = 10
+# How long to collect replies to the all-sources query
+SOURCE_LIST_TIMEOUT = 1.0
 MAX_TRIES = 5
-TRY_DELAY = 0.5
+INITIAL_BACKOFF = 0.05
+MAX_BACKOFF = 2.0
+READ_TIMEOUT = 0.2
+STORAGE_VERSION = 1
+
+# Queries sent as one burst on every poll, with their response prefixes
+STATUS_QUERIES = (
+    (b"?P\r", "PWR"),
+    (b"?V\r", "VOL"),
+    (b"?M\r", "MUT"),
+    (b"?F\r", "FN"),
+)
+
+CMD_POWER_ON = b"PO\r"
+CMD_POWER_OFF = b"PF\r"
+CMD_VOLUME_UP = b"VU\r"
+CMD_VOLUME_DOWN = b"VD\r"
+CMD_MUTE_ON = b"MO\r"
+CMD_MUTE_OFF = b"MF\r"
+CMD_QUERY_VOLUME = b"?V\r"
+CMD_SOURCE_LIST = b"?RGB\r"
+
+# RGB<source number><flag><source name>
+SOURCE_NAME_RE = re.compile(r"RGB(\d\d)\d(.*)")
+
+PWSTATE_TO_STATE = {"PWR0": STATE_ON, "PWR1": STATE_OFF, "PWR2": STATE_OFF}
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
@@ -66,19 +99,30 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
 )
 
 
-def setup_platform(hass, config, add_entities, discovery_info=None):
+@lru_cache(maxsize=MAX_VOLUME + 1)
+def volume_command(steps):
+    """Return the encoded command setting the volume to `steps`."""
+    return f"{steps:03}VL\r".encode("ASCII")
+
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the Pioneer platform."""
+    host = config[CONF_HOST]
+    port = config[CONF_PORT]
+    store = Store(hass, STORAGE_VERSION, f"pioneer_{host}_{port}")
     pioneer = PioneerDevice(
         config[CONF_NAME],
-        config[CONF_HOST],
-        config[CONF_PORT],
+        host,
+        port,
         config[CONF_TIMEOUT],
         config[CONF_SOURCES],
         config[CONF_FAKEVOLUMESET],
+        store,
     )
+    await pioneer.async_load_storage()
 
-    if pioneer.update():
-        add_entities([pioneer])
+    if await pioneer.async_update():
+        async_add_entities([pioneer])
     else:
         raise PlatformNotReady
 
@@ -86,119 +130,270 @@ def setup_platform(hass, config, add_entities, discovery_info=None):
 class PioneerDevice(MediaPlayerDevice):
     """Representation of a Pioneer device."""
 
-    def __init__(self, name, host, port, timeout, sources, fakevolumeset):
+    def __init__(self, name, host, port, timeout, sources, fakevolumeset, store):
         """Initialize the Pioneer device."""
         self._name = name
         self._host = host
         self._port = port
         self._timeout = timeout
-        self._pwstate = "PWR1"
+        self._state = STATE_OFF
         self._volume = 0
         self._muted = False
         self._selected_source = ""
         self._source_name_to_number = sources
         self._source_number_to_name = {v: k for k, v in sources.items()}
+        self._source_list = tuple(sources)
         self._fakevolumeset = fakevolumeset
         self._vol_inc_steps = None
+        self._store = store
+        # Latest requested fake volume, picked up once the running steps end
+        self._vol_target = None
+        self._vol_lock = asyncio.Lock()
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+        # Per-instance seed so several receivers don't retry in lockstep
+        self._random = random.Random(time.time_ns() ^ id(self))
+
+    async def async_load_storage(self):
+        """Load the volume step size probed in a previous run."""
+        data = await self._store.async_load()
+        if data:
+            self._vol_inc_steps = data.get("vol_inc_steps")
+
+    async def async_will_remove_from_hass(self):
+        """Close the telnet connection when the entity is removed."""
+        async with self._lock:
+            await self._async_disconnect()
+
+    def _backoff_iter(self):
+        """Yield capped exponential retry delays with full jitter."""
+        for attempt in range(MAX_TRIES):
+            yield self._random.uniform(
+                0, min(INITIAL_BACKOFF * (2 ** attempt), MAX_BACKOFF)
+            )
 
-    @classmethod
-    def telnet_request(cls, telnet, command, expected_prefix):
-        """Execute `command` and return the response."""
+    async def _async_connect(self):
+        """Open the persistent telnet connection to the receiver."""
+        # CONF_TIMEOUT defaults to the socket module's "no timeout" sentinel
+        timeout = self._timeout if isinstance(self._timeout, float) else None
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port), timeout
+        )
+
+    async def _async_disconnect(self):
+        """Close the persistent telnet connection, if open."""
+        if self._writer is None:
+            return
+        writer = self._writer
+        self._reader = self._writer = None
+        writer.close()
         try:
-            telnet.write(command.encode("ASCII") + b"\r")
-        except telnetlib.socket.timeout:
-            _LOGGER.debug("Pioneer command %s timed out", command)
-            return None
-
-        # The receiver will randomly send state change updates, make sure
-        # we get the response we are looking for
-        for _ in range(3):
-            result = telnet.read_until(b"\r\n", timeout=0.2).decode("ASCII").strip()
-            if result.startswith(expected_prefix):
-                return result
+            await writer.wait_closed()
+        except OSError:
+            pass
 
-        return None
-
-    def telnet_command(self, command):
-        """Establish a telnet connection and sends command."""
-        tries = MAX_TRIES
-        while tries > 0:
-            tries = tries - 1
-            try:
+    async def _async_read_line(self, timeout=READ_TIMEOUT):
+        """Read one line from the receiver, or None on timeout."""
+        try:
+            line = await asyncio.wait_for(self._reader.readuntil(b"\r\n"), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return line.decode("ASCII").strip()
+
+    async def _async_discard_buffered(self):
+        """Drop replies and state updates the receiver already sent."""
+        while True:
+            read = asyncio.ensure_future(self._reader.read(4096))
+            # A read of already buffered data completes within one loop pass
+            await asyncio.sleep(0)
+            if not read.done():
+                read.cancel()
                 try:
-                    telnet = telnetlib.Telnet(self._host, self._port, self._timeout)
-                    telnet.write(command.encode("ASCII") + b"\r")
-                    telnet.read_very_eager()  # skip response
-                    telnet.close()
+                    await read
+                except asyncio.CancelledError:
+                    pass
+                return
+            if not read.result():
+                return
+
+    async def _async_write(self, data):
+        """Write raw bytes to the receiver, dropping any stale input first."""
+        await self._async_discard_buffered()
+        self._writer.write(data)
+        await self._writer.drain()
+
+    async def _async_read_responses(self, prefixes, timeout):
+        """Read response lines until all `prefixes` are answered.
+
+        The receiver will randomly send state change updates, those are
+        skipped. All reads share a single deadline `timeout` seconds away, and
+        reading stops early once the receiver goes quiet. Return a dict
+        mapping each answered prefix to its response.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        pending = list(prefixes)
+        responses = {}
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            result = await self._async_read_line(min(remaining, READ_TIMEOUT))
+            if result is None:
+                break
+            for prefix in pending:
+                if result.startswith(prefix):
+                    responses[prefix] = result
+                    pending.remove(prefix)
                     break
-                except (ConnectionRefusedError, OSError):
-                    _LOGGER.warning(
-                        "telnet_command: Pioneer %s refused connection", self._name
-                    )
-                    time.sleep(TRY_DELAY)
-                    continue
-            except telnetlib.socket.timeout:
-                _LOGGER.debug("Pioneer %s command %s timed out", self._name, command)
-        if tries == 0:
-            _LOGGER.warning(
-                "Tried %d times, but Pioneer %s still refused connection",
-                MAX_TRIES,
-                self._name,
-            )
 
-    def update(self):
-        """Get the latest details from the device."""
-        tries = MAX_TRIES
-        while tries > 0:
-            tries = tries - 1
+        return responses
+
+    async def async_telnet_request(self, command, expected_prefix):
+        """Execute the encoded `command` and return the response."""
+        await self._async_write(command)
+        responses = await self._async_read_responses([expected_prefix], READ_TIMEOUT)
+        return responses.get(expected_prefix)
+
+    async def async_telnet_batch_request(self, queries):
+        """Execute `(command, expected_prefix)` queries in a single write.
+
+        Return a dict mapping each expected prefix to its response.
+        """
+        await self._async_write(b"".join(command for command, _ in queries))
+        return await self._async_read_responses(
+            [prefix for _, prefix in queries], READ_TIMEOUT * len(queries)
+        )
+
+    async def _async_with_retry(self, operation, name):
+        """Await `operation()` over the persistent connection.
+
+        The connection is opened when needed, and closed again after a
+        connection error, before retrying with backoff. Return True if the
+        operation eventually succeeded. The caller must hold `self._lock`.
+        """
+        backoff = self._backoff_iter()
+        for attempt in range(MAX_TRIES):
             try:
-                telnet = telnetlib.Telnet(self._host, self._port, self._timeout)
-                break
-            except (ConnectionRefusedError, OSError):
-                _LOGGER.debug("update: Pioneer %s refused connection", self._name)
-                time.sleep(TRY_DELAY)
-                continue
-        if tries == 0:
-            _LOGGER.warning(
-                "Tried %d times, but Pioneer %s still refused connection",
-                MAX_TRIES,
-                self._name,
-            )
-            return False
+                if self._writer is None:
+                    await self._async_connect()
+                await operation()
+                return True
+            except (asyncio.TimeoutError, EOFError, OSError) as err:
+                _LOGGER.debug("%s: Pioneer %s failed: %s", name, self._name, err)
+                await self._async_disconnect()
+                if attempt < MAX_TRIES - 1:
+                    await asyncio.sleep(next(backoff))
+        _LOGGER.warning(
+            "Tried %d times, but Pioneer %s still refused connection",
+            MAX_TRIES,
+            self._name,
+        )
+        return False
+
+    async def _async_raw_send(self, command, expected_prefix):
+        """Send the encoded `command` and return its `expected_prefix` reply."""
+        reply = None
+
+        async def send():
+            nonlocal reply
+            reply = await self.async_telnet_request(command, expected_prefix)
+
+        async with self._lock:
+            await self._async_with_retry(send, "raw_send")
+        return reply
+
+    def _update_volume(self, volume_str):
+        """Track the volume reported in a VOL reply, if there is one."""
+        if volume_str:
+            self._volume = int(volume_str[3:]) / MAX_VOLUME
+
+    async def async_update(self):
+        """Get the latest details from the device."""
+        async with self._lock:
+            return await self._async_with_retry(self._async_update_state, "update")
+
+    async def _async_update_state(self):
+        """Query the receiver state over the open connection."""
+        responses = await self.async_telnet_batch_request(STATUS_QUERIES)
 
-        pwstate = self.telnet_request(telnet, "?P", "PWR")
+        pwstate = responses.get("PWR")
         if pwstate:
-            self._pwstate = pwstate
+            self._state = PWSTATE_TO_STATE.get(pwstate)
 
-        volume_str = self.telnet_request(telnet, "?V", "VOL")
+        volume_str = responses.get("VOL")
         self._volume = int(volume_str[3:]) / MAX_VOLUME if volume_str else None
 
-        muted_value = self.telnet_request(telnet, "?M", "MUT")
+        muted_value = responses.get("MUT")
         self._muted = (muted_value == "MUT0") if muted_value else None
 
         # Build the source name dictionaries if necessary
         if not self._source_name_to_number:
-            for i in range(MAX_SOURCE_NUMBERS):
-                result = self.telnet_request(telnet, f"?RGB{str(i).zfill(2)}", "RGB")
+            await self._async_discover_sources()
 
-                if not result:
-                    continue
-
-                source_name = result[6:]
-                source_number = str(i).zfill(2)
-
-                self._source_name_to_number[source_name] = source_number
-                self._source_number_to_name[source_number] = source_name
-
-        source_number = self.telnet_request(telnet, "?F", "FN")
+        source_number = responses.get("FN")
 
         if source_number:
             self._selected_source = self._source_number_to_name.get(source_number[2:])
         else:
             self._selected_source = None
 
-        telnet.close()
-        return True
+    async def _async_discover_sources(self):
+        """Query the receiver for the names of its input sources."""
+        sources = await self._async_query_source_list()
+        if len(sources) < 2:
+            # Not supported by this model, only an error came back
+            sources = await self._async_scan_sources()
+
+        for source_number, source_name in sorted(sources.items()):
+            self._source_name_to_number[source_name] = source_number
+            self._source_number_to_name[source_number] = source_name
+
+        self._source_list = tuple(self._source_name_to_number)
+
+    async def _async_query_source_list(self):
+        """Ask for all source names at once, which newer models support.
+
+        Return a dict mapping source numbers to names.
+        """
+        await self._async_write(CMD_SOURCE_LIST)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SOURCE_LIST_TIMEOUT
+        sources = {}
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            result = await self._async_read_line(min(remaining, READ_TIMEOUT))
+            if result is None:
+                break
+            match = SOURCE_NAME_RE.match(result)
+            if match:
+                sources[match.group(1)] = match.group(2)
+
+        return sources
+
+    async def _async_scan_sources(self):
+        """Query the source names slot by slot, a burst of slots at a time.
+
+        Return a dict mapping source numbers to names.
+        """
+        # Source numbers are sparse, so every slot has to be asked for
+        sources = {}
+        for start in range(0, MAX_SOURCE_NUMBERS, SOURCE_BATCH_SIZE):
+            queries = [
+                (f"?RGB{i:02}\r".encode("ASCII"), f"RGB{i:02}")
+                for i in range(
+                    start, min(start + SOURCE_BATCH_SIZE, MAX_SOURCE_NUMBERS)
+                )
+            ]
+            responses = await self.async_telnet_batch_request(queries)
+            for prefix, result in responses.items():
+                sources[prefix[3:]] = result[6:]
+
+        return sources
 
     @property
     def name(self):
@@ -208,14 +403,7 @@ class PioneerDevice(MediaPlayerDevice):
     @property
     def state(self):
         """Return the state of the device."""
-        if self._pwstate == "PWR2":
-            return STATE_OFF
-        if self._pwstate == "PWR1":
-            return STATE_OFF
-        if self._pwstate == "PWR0":
-            return STATE_ON
-
-        return None
+        return self._state
 
     @property
     def volume_level(self):
@@ -240,78 +428,130 @@ class PioneerDevice(MediaPlayerDevice):
     @property
     def source_list(self):
         """List of available input sources."""
-        return list(self._source_name_to_number.keys())
+        return self._source_list
 
     @property
     def media_title(self):
         """Title of current playing media."""
         return self._selected_source
 
-    def turn_off(self):
+    async def async_turn_off(self):
         """Turn off media player."""
-        self.telnet_command("PF")
+        await self._async_raw_send(CMD_POWER_OFF, "PWR")
 
-    def volume_up(self):
+    async def async_volume_up(self):
         """Volume up media player."""
-        self.telnet_command("VU")
+        self._update_volume(await self._async_raw_send(CMD_VOLUME_UP, "VOL"))
 
-    def volume_down(self):
+    async def async_volume_down(self):
         """Volume down media player."""
-        self.telnet_command("VD")
+        self._update_volume(await self._async_raw_send(CMD_VOLUME_DOWN, "VOL"))
 
-    def set_volume_level(self, volume):
+    async def async_set_volume_level(self, volume):
         """Set volume level, range 0..1."""
+        target_steps = round(volume * MAX_VOLUME)
+        if (
+            not self._vol_lock.locked()
+            and self._volume is not None
+            and target_steps == round(self._volume * MAX_VOLUME)
+        ):
+            return
+
         if self._fakevolumeset:
-            tries = MAX_TRIES
-            while tries > 0:
-                tries = tries - 1
-                try:
-                    telnet = telnetlib.Telnet(self._host, self._port, self._timeout)
-                    target_steps = int(volume * MAX_VOLUME)
-                    cmd = "VU" if (volume > self._volume) else "VD"
-
-                    if self._vol_inc_steps == None:
-                        # VU and VD increase/decrease volumes in fixed steps (usually 2 but not known for all devices), probe if unknown:
-                        volume_str1 = self.telnet_request(telnet, "VU", "VOL")
-                        volume_str2 = self.telnet_request(telnet, "VD", "VOL")
-                        if volume_str1 and volume_str2:
-                            vol1 = int(volume_str1[3:])
-                            vol2 = int(volume_str2[3:])
-                            self._vol_inc_steps = abs(vol2 - vol1)
-                        else:
-                            _LOGGER.error("No response from {} while probing step size".format(self._name))
-                            time.sleep(TRY_DELAY)
-                            continue
-
-                    while abs(target_steps - int(self._volume *MAX_VOLUME)) >= self._vol_inc_steps:
-                        volume_str = self.telnet_request(telnet, cmd, "VOL")
-                        if volume_str:
-                            current_steps = int(volume_str[3:])
-                            self._volume = current_steps / MAX_VOLUME
-                        else:
-                            _LOGGER.error("No response from {} while fake setting volume".format(self._name))
-                            break
-
-                    self._volume = target_steps / MAX_VOLUME
-                    telnet.close()
-                    break
-                except (ConnectionRefusedError, OSError):
-                    _LOGGER.debug("Pioneer %s refused connection", self._name)
-                    time.sleep(TRY_DELAY)
-                    continue
-            if tries == 0: _LOGGER.warning("Tried %d times, but Pioneer %s still refused connection", MAX_TRIES, self._name)
+            self._vol_target = volume
+            if self._vol_lock.locked():
+                # Already stepping, the running loop continues to the new target
+                return
+            async with self._vol_lock:
+                while self._vol_target is not None:
+                    target = self._vol_target
+                    self._vol_target = None
+                    async with self._lock:
+                        if self._vol_inc_steps is None:
+                            await self._async_with_retry(
+                                self._async_probe_volume_step, "probe_volume_step"
+                            )
+                            if self._vol_inc_steps is None:
+                                continue
+                            # The step size is fixed per model, keep it
+                            await self._store.async_save(
+                                {"vol_inc_steps": self._vol_inc_steps}
+                            )
+                        await self._async_with_retry(
+                            partial(self._async_fake_set_volume_level, target),
+                            "set_volume_level",
+                        )
+        else:
+            # 60dB max
+            self._update_volume(
+                await self._async_raw_send(volume_command(target_steps), "VOL")
+            )
+
+    async def _async_probe_volume_step(self):
+        """Probe the step size of VU and VD, leaving it unset on failure."""
+        # VU and VD increase/decrease volumes in fixed steps (usually 2 but not
+        # known for all devices)
+        volume_str1 = await self.async_telnet_request(CMD_VOLUME_UP, "VOL")
+        volume_str2 = await self.async_telnet_request(CMD_VOLUME_DOWN, "VOL")
+        if not (volume_str1 and volume_str2) or volume_str1 == volume_str2:
+            _LOGGER.error("Could not probe volume step size of %s", self._name)
+            return
+        vol1 = int(volume_str1[3:])
+        vol2 = int(volume_str2[3:])
+        self._vol_inc_steps = abs(vol2 - vol1)
+
+    async def _async_fake_set_volume_level(self, volume):
+        """Step the volume towards `volume` using VU/VD commands."""
+        # Start from the receiver's actual volume, so a retry after a dropped
+        # connection doesn't repeat steps that were already applied
+        volume_str = await self.async_telnet_request(CMD_QUERY_VOLUME, "VOL")
+        if not volume_str:
+            _LOGGER.error("Unknown current volume of %s, cannot step it", self._name)
+            return
+        current_steps = int(volume_str[3:])
+        self._volume = current_steps / MAX_VOLUME
+
+        target_steps = round(volume * MAX_VOLUME)
+        cmd = CMD_VOLUME_UP if target_steps > current_steps else CMD_VOLUME_DOWN
+        count = abs(target_steps - current_steps) // self._vol_inc_steps
+        if not count:
+            return
+
+        await self._async_write(cmd * count)
+        volume_str = await self._async_read_last_volume(count)
+        if volume_str:
+            self._volume = int(volume_str[3:]) / MAX_VOLUME
         else:
-        # 60dB max
-        self.telnet_command(f"{round(volume * MAX_VOLUME):03}VL")
+            _LOGGER.error("No response from %s while fake setting volume", self._name)
+
+    async def _async_read_last_volume(self, count):
+        """Read up to `count` VOL replies and return the last one."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + READ_TIMEOUT * count
+        volume_str = None
+        while count:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            result = await self._async_read_line(min(remaining, READ_TIMEOUT))
+            if result is None:
+                break
+            if result.startswith("VOL"):
+                volume_str = result
+                count -= 1
+
+        return volume_str
 
-    def mute_volume(self, mute):
+    async def async_mute_volume(self, mute):
         """Mute (true) or unmute (false) media player."""
-        self.telnet_command("MO" if mute else "MF")
+        await self._async_raw_send(CMD_MUTE_ON if mute else CMD_MUTE_OFF, "MUT")
 
-    def turn_on(self):
+    async def async_turn_on(self):
         """Turn the media player on."""
-        self.telnet_command("PO")
+        await self._async_raw_send(CMD_POWER_ON, "PWR")
 
-    def select_source(self, source):
+    async def async_select_source(self, source):
         """Select input source."""
-        self.telnet_command(f"{self._source_name_to_number.get(source)}FN")
+        await self._async_raw_send(
+            f"{self._source_name_to_number.get(source)}FN\r".encode("ASCII"), "FN"
+        )